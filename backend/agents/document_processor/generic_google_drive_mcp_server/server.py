@@ -1,20 +1,49 @@
 """Google Drive MCP Server."""
 
 import os
+import json
+import hashlib
 import logging
 import asyncio
+import csv
+import math
+import multiprocessing
+import threading
+import zipfile
+from collections import OrderedDict, defaultdict
+from functools import lru_cache, partial, wraps
+from pathlib import Path
 from mcp.server.fastmcp import FastMCP
+import google.auth
+import google.auth.exceptions
+import httplib2
+import orjson
+from cachetools import TTLCache
 from google.oauth2.service_account import Credentials as ServiceAccountCredentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 import io
 import tempfile
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import openpyxl
 from docx import Document as DocxDocument
 from pptx import Presentation
-import PyPDF2
+import pypdf
+import zstandard
 from dotenv import load_dotenv
 
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
 load_dotenv()
 
 logging.basicConfig(
@@ -24,15 +53,242 @@ logger = logging.getLogger("gdrive-competitor-mcp-server")
 
 mcp = FastMCP("gdrive-competitor-analysis")
 
-document_cache = {}
+
+def json_tool(fn):
+    # Registers fn as an MCP tool whose result is serialized with orjson rather
+    # than FastMCP's default encoder. The undecorated coroutine is returned so
+    # tools can still call each other and get Python objects back.
+    @wraps(fn)
+    async def tool(*args, **kwargs):
+        return orjson.dumps(await fn(*args, **kwargs), default=str).decode()
+
+    mcp.tool()(tool)
+    return fn
+
+
+DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
+
+METADATA_FIELDS = "id,name,mimeType,size,createdTime,modifiedTime,parents"
+
+# Fields returned by the listing tools unless the caller asks for others.
+DEFAULT_PROJECTION = ["id", "name", "mimeType", "modifiedTime"]
+
+# Drive starts returning 500s on batches well below its documented cap of 100.
+BATCH_SIZE = 25
+
+# Drive's maximum page size for files.list; the default of 100 multiplies requests.
+LIST_PAGE_SIZE = 1000
+
+_PDF_MIMES = ("application/pdf",)
+_EXCEL_MIMES = (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.ms-excel",
+    "application/vnd.google-apps.spreadsheet",
+)
+_WORD_MIMES = (
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/msword",
+    "application/vnd.google-apps.document",
+)
+_PRESENTATION_MIMES = (
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    "application/vnd.ms-powerpoint",
+    "application/vnd.google-apps.presentation",
+)
+_TEXT_MIMES = ("text/plain",)
+
+# file_types values accepted by list_drive_files, mapped to the MIME types they match.
+TYPE_TO_MIMES = {
+    "pdf": _PDF_MIMES,
+    "excel": _EXCEL_MIMES,
+    "xlsx": _EXCEL_MIMES,
+    "xls": _EXCEL_MIMES,
+    "word": _WORD_MIMES,
+    "doc": _WORD_MIMES,
+    "docx": _WORD_MIMES,
+    "ppt": _PRESENTATION_MIMES,
+    "pptx": _PRESENTATION_MIMES,
+    "presentation": _PRESENTATION_MIMES,
+    "txt": _TEXT_MIMES,
+    "text": _TEXT_MIMES,
+}
+
+_HASH_CHUNK_SIZE = 65536
+
+# Downloads stay in memory up to this size, then spill to a temporary file on disk.
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+# Bytes fetched per ranged GET. Pinned because the library default varies by
+# release: older versions use small chunks (hundreds of round trips per large
+# file), newer ones 100 MB, which is buffered in memory before being written out.
+DOWNLOAD_CHUNK_SIZE = 32 * 1024 * 1024
 
 SERVER_CONFIG = {
     "credentials_path": os.environ.get("CREDENTIALS_PATH"),
     "base_folder_id": os.environ.get("BASE_FOLDER_ID"),
     "base_folder_name": os.environ.get("BASE_FOLDER_NAME"),
+    "cache_dir": os.environ.get(
+        "DOCUMENT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "gdrive-mcp-cache")
+    ),
+    "cache_max_entries": int(os.environ.get("DOCUMENT_CACHE_MAX_ENTRIES", "512")),
+    "memory_cache_max_entries": int(
+        os.environ.get("DOCUMENT_MEMORY_CACHE_MAX_ENTRIES", "128")
+    ),
+    "memory_cache_max_bytes": int(
+        os.environ.get("DOCUMENT_MEMORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+    ),
+    "list_cache_ttl": int(os.environ.get("LIST_CACHE_TTL", "60")),
+    "preview_max_chars": int(os.environ.get("PREVIEW_MAX_CHARS", "20000")),
+    "metadata_cache_ttl": int(os.environ.get("METADATA_CACHE_TTL", "300")),
+    "io_workers": int(os.environ.get("IO_WORKERS", "8")),
+    "cpu_workers": int(os.environ.get("CPU_WORKERS", str(os.cpu_count() or 1))),
+    "request_timeout": float(os.environ.get("DRIVE_TIMEOUT_SEC", "60")),
+    "request_retries": int(os.environ.get("DRIVE_NUM_RETRIES", "3")),
+    "pdf_backend": os.environ.get("PDF_BACKEND", "pymupdf"),
 }
 
+# Dedicated pool for blocking Drive and cache I/O, so it doesn't compete with
+# anything else scheduled on the event loop's default executor.
+_IO_EXEC = ThreadPoolExecutor(
+    max_workers=SERVER_CONFIG["io_workers"], thread_name_prefix="gdrive-io"
+)
+
+
+def _new_cpu_pool():
+    # Workers are spawned rather than forked: a fork would copy this process while
+    # _IO_EXEC threads may be holding locks, leaving them held forever in the child.
+    return ProcessPoolExecutor(
+        max_workers=SERVER_CONFIG["cpu_workers"],
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+# Text extraction is CPU-bound pure Python for most formats, so it runs in worker
+# processes: it gets past the GIL and a slow document can't starve Drive calls.
+# This is the only level of parallelism for extraction: each document is extracted
+# by one worker, and concurrent documents spread across the pool.
+_CPU_EXEC = _new_cpu_pool()
+
+# Short-lived cache of listing and search responses, keyed by tool and arguments.
+_LIST_CACHE = TTLCache(maxsize=1024, ttl=SERVER_CONFIG["list_cache_ttl"])
+
+# Full file metadata (METADATA_FIELDS) by file ID, shared by the metadata tools.
+_METADATA_CACHE = TTLCache(maxsize=4096, ttl=SERVER_CONFIG["metadata_cache_ttl"])
+
+# In-flight calls by key, used by _singleflight to coalesce duplicate requests.
+_INFLIGHT = {}
+
+CACHE_DIR = Path(SERVER_CONFIG["cache_dir"])
+CACHE_INDEX_PATH = CACHE_DIR / "index.json"
+CACHE_DOCUMENTS_DIR = CACHE_DIR / "documents"
+
+
+class _LRUDocCache:
+    # In-memory LRU of extracted text by content hash, bounded by entry count and
+    # total compressed size. Sits in front of the on-disk cache so hot documents
+    # skip the file read. Text is held zstd-compressed (extracted text typically
+    # shrinks 5-10x), together with its length so callers that only want a prefix
+    # don't have to decompress the whole document.
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._compressor = zstandard.ZstdCompressor(level=3)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def get(self, key, max_chars=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        blob, length = entry
+        if max_chars is None or max_chars >= length:
+            return self._decompressor.decompress(blob).decode("utf-8"), length
+        # UTF-8 uses at most 4 bytes per character, so this head covers max_chars.
+        with self._decompressor.stream_reader(blob) as reader:
+            head = reader.read(max_chars * 4)
+        return head.decode("utf-8", errors="replace")[:max_chars], length
+
+    def put(self, key, text):
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key)[0])
+        blob = self._compressor.compress(text.encode("utf-8"))
+        if len(blob) > self.max_bytes:
+            return
+        self._entries[key] = (blob, len(text))
+        self._bytes += len(blob)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+
+_DOC_MEMORY_CACHE = _LRUDocCache(
+    SERVER_CONFIG["memory_cache_max_entries"], SERVER_CONFIG["memory_cache_max_bytes"]
+)
+
+
+def _load_document_index():
+    try:
+        with open(CACHE_INDEX_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable document cache index: {str(e)}")
+        return {}
+
+
+# Maps Drive file IDs to {"hash": <sha256 of file bytes>, "metadata": {...}}.
+# Extracted text is stored once per content hash under CACHE_DOCUMENTS_DIR.
+document_index = _load_document_index()
+
+
+class _ThreadLocalHttp:
+    # httplib2.Http is not thread-safe, and requests execute on worker threads.
+    # Each thread gets its own authorized connection and keeps reusing it, so
+    # TLS handshakes happen once per worker rather than once per request.
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self._local = threading.local()
 
+    def request(self, *args, **kwargs):
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = AuthorizedHttp(
+                self.credentials,
+                http=httplib2.Http(timeout=SERVER_CONFIG["request_timeout"]),
+            )
+        try:
+            return http.request(*args, **kwargs)
+        except (OSError, httplib2.HttpLib2Error):
+            # Drop a connection that timed out or failed so the retry reconnects.
+            self._local.http = None
+            raise
+        except google.auth.exceptions.RefreshError:
+            # The credentials can no longer be refreshed (e.g. a rotated key);
+            # rebuild the service from the credentials file on the next call.
+            reset_drive_service()
+            raise
+
+
+def _build_drive_service(creds):
+    # Load the Drive discovery document bundled with google-api-python-client
+    # rather than fetching (or probing a file cache for) it on every build.
+    return build(
+        "drive",
+        "v3",
+        http=_ThreadLocalHttp(creds),
+        cache_discovery=False,
+        static_discovery=True,
+    )
+
+
+@lru_cache(maxsize=1)
 def get_drive_service():
     try:
         service_account_file = os.environ.get("GOOGLE_SERVICE_ACCOUNT_FILE")
@@ -44,10 +300,9 @@ def get_drive_service():
         if os.path.exists(service_account_file):
             logger.info("Using service account credentials")
             creds = ServiceAccountCredentials.from_service_account_file(
-                service_account_file,
-                scopes=["https://www.googleapis.com/auth/drive.readonly"],
+                service_account_file, scopes=DRIVE_SCOPES
             )
-            return build("drive", "v3", credentials=creds)
+            return _build_drive_service(creds)
 
         else:
             logger.error("GOOGLE_SERVICE_ACCOUNT_FILE environment variable not set")
@@ -55,7 +310,8 @@ def get_drive_service():
         application_creds = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
         if application_creds and os.path.exists(application_creds):
             logger.info("Using Google Application Default Credentials")
-            return build("drive", "v3", credentials=None)
+            creds, _ = google.auth.default(scopes=DRIVE_SCOPES)
+            return _build_drive_service(creds)
 
         raise ValueError(
             "No Google Drive credentials found. Please set one of: GOOGLE_SERVICE_ACCOUNT_FILE, GOOGLE_APPLICATION_CREDENTIALS, GOOGLE_CREDENTIALS_FILE, or GOOGLE_CREDENTIALS"
@@ -66,161 +322,587 @@ def get_drive_service():
         raise
 
 
-def extract_text_from_file(file_content, mime_type, file_name):
-    if "pdf" in mime_type:
-        return extract_text_from_pdf(file_content)
-    elif (
-        "spreadsheet" in mime_type
-        or file_name.endswith(".xlsx")
-        or file_name.endswith(".xls")
-    ):
-        return extract_text_from_excel(file_content)
-    elif "presentation" in mime_type or file_name.endswith((".pptx", ".ppt")):
-        return extract_text_from_presentation(file_content)
-    elif "document" in mime_type or file_name.endswith((".docx", ".doc")):
-        return extract_text_from_docx(file_content)
-    elif "text/plain" in mime_type or file_name.endswith(".txt"):
-        return file_content.decode("utf-8", errors="replace")
+def reset_drive_service():
+    get_drive_service.cache_clear()
+
+
+async def _run_io(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_IO_EXEC, fn, *args)
+
+
+async def _run_cpu(fn, *args):
+    global _CPU_EXEC
+    executor = _CPU_EXEC
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. a crash inside a native parser, or the OOM killer),
+        # which breaks the whole pool; replace it so later extractions still work.
+        # Concurrent failures from the same pool only replace it once.
+        if _CPU_EXEC is executor:
+            logger.error("Extraction worker died; restarting the worker pool")
+            _CPU_EXEC = _new_cpu_pool()
+            executor.shutdown(wait=False)
+        raise
+
+
+async def _execute(request):
+    return await _run_io(
+        partial(request.execute, num_retries=SERVER_CONFIG["request_retries"])
+    )
+
+
+async def _singleflight(key, coro_factory):
+    # Concurrent callers with the same key share a single in-flight call. The
+    # task is shielded so one caller being cancelled doesn't cancel the rest.
+    task = _INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(coro_factory())
+        _INFLIGHT[key] = task
+        task.add_done_callback(lambda _: _INFLIGHT.pop(key, None))
+    return await asyncio.shield(task)
+
+
+def _esc(value):
+    # Escape a value for use inside a single-quoted Drive query string.
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+def _build_type_filter(file_types):
+    if file_types.lower() == "all":
+        return ""
+    mimes = dict.fromkeys(
+        mime
+        for file_type in file_types.split(",")
+        for mime in TYPE_TO_MIMES.get(file_type.strip().lower(), ())
+    )
+    if not mimes:
+        return ""
+    return " and (" + " or ".join(f"mimeType='{m}'" for m in mimes) + ")"
+
+
+def _list_fields(projection):
+    return f"nextPageToken, files({','.join(projection or DEFAULT_PROJECTION)})"
+
+
+async def _list_all(drive_service, limit=None, **kwargs):
+    # With a limit, pages are only as large as needed and paging stops once it's met.
+    page_size = LIST_PAGE_SIZE if limit is None else min(limit, LIST_PAGE_SIZE)
+    files = []
+    request = drive_service.files().list(pageSize=page_size, **kwargs)
+    while request is not None:
+        response = await _execute(request)
+        files.extend(response.get("files", []))
+        if limit is not None and len(files) >= limit:
+            return files[:limit]
+        request = drive_service.files().list_next(request, response)
+    return files
+
+
+def _download_file(drive_service, file_id, export_mime=None, size=0):
+    # Files known to be larger than the spool go straight to a named temporary file,
+    # which extraction workers open by path instead of being sent its bytes.
+    if size > SPOOL_MAX_SIZE:
+        file_content = tempfile.NamedTemporaryFile(suffix=".download")
     else:
-        return f"Unsupported file type: {mime_type} ({file_name})"
+        file_content = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        if export_mime:
+            # Exports are capped at 10 MB by Drive, so fetch the body in one request.
+            request = drive_service.files().export_media(
+                fileId=file_id, mimeType=export_mime
+            )
+            file_content.write(
+                request.execute(num_retries=SERVER_CONFIG["request_retries"])
+            )
+        else:
+            request = drive_service.files().get_media(fileId=file_id)
+            downloader = MediaIoBaseDownload(
+                file_content, request, chunksize=DOWNLOAD_CHUNK_SIZE
+            )
+            done = False
+            while not done:
+                status, done = downloader.next_chunk(
+                    num_retries=SERVER_CONFIG["request_retries"]
+                )
+    except Exception:
+        file_content.close()
+        raise
+    file_content.seek(0)
+    return file_content
 
 
-def extract_text_from_pdf(file_content):
-    text = []
-    with io.BytesIO(file_content) as pdf_file:
-        try:
-            reader = PyPDF2.PdfReader(pdf_file)
-            text.append(f"PDF Document with {len(reader.pages)} pages\n")
-
-            for page_num in range(len(reader.pages)):
-                page_text = reader.pages[page_num].extract_text()
-                if page_text.strip():
-                    text.append(f"\n--- Page {page_num + 1} ---\n")
-                    text.append(page_text)
-                else:
-                    text.append(
-                        f"\n--- Page {page_num + 1} (No extractable text) ---\n"
-                    )
-        except Exception as e:
-            text.append(f"Error extracting PDF text: {str(e)}")
+def _fetch_metadata_batch(file_ids):
+    results = {}
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            results[request_id] = {
+                "error": True,
+                "message": f"Error getting file metadata: {str(exception)}",
+            }
+        else:
+            results[request_id] = response
+
+    drive_service = get_drive_service()
+    batch = drive_service.new_batch_http_request(callback=callback)
+    for file_id in file_ids:
+        batch.add(
+            drive_service.files().get(fileId=file_id, fields=METADATA_FIELDS),
+            request_id=file_id,
+        )
+    batch.execute()
+    return results
+
+
+async def _get_metadata_many(file_ids):
+    metadata = {}
+    missing_ids = []
+    for file_id in dict.fromkeys(file_ids):
+        if file_id in _METADATA_CACHE:
+            metadata[file_id] = _METADATA_CACHE[file_id]
+        else:
+            missing_ids.append(file_id)
 
-    return "\n".join(text)
+    batches = [
+        missing_ids[i : i + BATCH_SIZE] for i in range(0, len(missing_ids), BATCH_SIZE)
+    ]
+    batch_results = await asyncio.gather(
+        *[_run_io(_fetch_metadata_batch, batch) for batch in batches]
+    )
 
+    for result in batch_results:
+        for file_id, file_metadata in result.items():
+            if not file_metadata.get("error"):
+                _METADATA_CACHE[file_id] = file_metadata
+        metadata.update(result)
+    return metadata
 
-def extract_text_from_excel(file_content):
-    text_output = []
 
-    with io.BytesIO(file_content) as file_obj:
+def _content_hash(file_obj):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file_obj.read(_HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def _cache_entry_path(content_hash):
+    return CACHE_DOCUMENTS_DIR / f"{content_hash}.json"
+
+
+def _read_cache_entry(content_hash):
+    path = _cache_entry_path(content_hash)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            content = json.load(f)["content"]
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        # Evicted by a concurrent write since the read; the text is still good.
+        pass
+    return content
+
+
+def _atomic_write_text(path, text):
+    # Concurrent writers each get their own temp file; os.replace is atomic.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=path.parent, suffix=".tmp", delete=False
+    ) as f:
+        f.write(text)
+    os.replace(f.name, path)
+
+
+def _write_cache_entry(content_hash, content):
+    _atomic_write_text(
+        _cache_entry_path(content_hash), json.dumps({"content": content})
+    )
+
+    entries = []
+    for entry in CACHE_DOCUMENTS_DIR.glob("*.json"):
         try:
-            excel_file = pd.ExcelFile(file_obj)
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                text_output.append(f"\n\n=== SHEET: {sheet_name} ===\n")
-                if df.empty:
-                    text_output.append("(Empty sheet)")
-                    continue
-
-                text_output.append(
-                    "COLUMNS: " + ", ".join(df.columns.astype(str)) + "\n"
-                )
+            entries.append((entry.stat().st_mtime, entry))
+        except FileNotFoundError:
+            continue
+    entries.sort()
+
+    evicted = []
+    excess = len(entries) - SERVER_CONFIG["cache_max_entries"]
+    for _, entry in entries[: max(0, excess)]:
+        entry.unlink(missing_ok=True)
+        evicted.append(entry.stem)
+    return evicted
+
+
+def _write_document_index(serialized_index):
+    _atomic_write_text(CACHE_INDEX_PATH, serialized_index)
+
+
+def _clear_cache_dir():
+    removed = 0
+    if CACHE_DOCUMENTS_DIR.exists():
+        for entry in CACHE_DOCUMENTS_DIR.glob("*.json"):
+            entry.unlink(missing_ok=True)
+            removed += 1
+    CACHE_INDEX_PATH.unlink(missing_ok=True)
+    return removed
+
+
+async def _save_document_index():
+    await _run_io(_write_document_index, json.dumps(document_index))
+
+
+async def _get_cached_text(content_hash, max_chars=None):
+    # Returns (text, total_length), with text cut to max_chars, or None on a miss.
+    cached = _DOC_MEMORY_CACHE.get(content_hash, max_chars)
+    if cached is not None:
+        return cached
+    text = await _run_io(_read_cache_entry, content_hash)
+    if text is None:
+        return None
+    _DOC_MEMORY_CACHE.put(content_hash, text)
+    return text[:max_chars], len(text)
+
+
+async def _extract_with_cache(file_content, extractor, *args, max_chars=None):
+    # Returns (content_hash, text). With max_chars, extraction may stop early; such
+    # a partial text is not cached and comes back with a content_hash of None.
+    content_hash = await _run_io(_content_hash, file_content)
+    cached = await _get_cached_text(content_hash)
+    extracted_text = cached[0] if cached is not None else None
+    if extracted_text is None:
+        source = getattr(file_content, "name", None)
+        if not isinstance(source, str):
+            # A spooled download, so its size was at most SPOOL_MAX_SIZE (or unknown,
+            # which only Google exports are, and those are capped at 10 MB).
+            source = await _run_io(file_content.read)
+        extracted_text = await _run_cpu(
+            _extract_source, extractor, source, *args, max_chars
+        )
+        if max_chars is not None and len(extracted_text) > max_chars:
+            return None, extracted_text
+        evicted = await _run_io(_write_cache_entry, content_hash, extracted_text)
+        _DOC_MEMORY_CACHE.put(content_hash, extracted_text)
+        if evicted:
+            evicted = set(evicted)
+            for cached_id in [
+                fid for fid, entry in document_index.items() if entry["hash"] in evicted
+            ]:
+                del document_index[cached_id]
+    return content_hash, extracted_text
+
+
+def _extract_source(extractor, source, *args):
+    # Runs in a _CPU_EXEC worker process, where file objects can't be sent: large
+    # downloads arrive as the path of their temporary file, small ones as bytes.
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return extractor(f, *args)
+    return extractor(io.BytesIO(source), *args)
+
+
+def _file_handler(mime_type, file_name):
+    return _MIME_DISPATCH.get(mime_type) or _EXT_DISPATCH.get(
+        os.path.splitext(file_name)[1].lower()
+    )
+
+
+# Every extractor takes an optional max_chars. When given, extraction may stop as
+# soon as the output is longer than max_chars, so a result longer than max_chars
+# is only a prefix of the document; one of max_chars or fewer is complete.
+
+
+def extract_text_from_file(file_obj, mime_type, file_name, max_chars=None):
+    handler = _file_handler(mime_type, file_name)
+    if handler is None:
+        return f"Unsupported file type: {mime_type} ({file_name})"
+    return handler(file_obj, max_chars)
 
-                text_output.append(df.to_string(index=True))
 
-                numeric_cols = df.select_dtypes(include=["number"]).columns
-                if len(numeric_cols) > 0:
-                    text_output.append("\nNUMERIC COLUMN STATISTICS:")
-                    stats = df[numeric_cols].describe().to_string()
-                    text_output.append(stats)
-        except Exception as e:
-            text_output.append(f"Error processing Excel file: {str(e)}")
+def extract_text_from_plain(file_obj, max_chars=None):
+    if max_chars is None:
+        return file_obj.read().decode("utf-8", errors="replace")
+    # UTF-8 uses at most 4 bytes per character, so this head covers max_chars + 1.
+    head = file_obj.read((max_chars + 1) * 4)
+    return head.decode("utf-8", errors="replace")[: max_chars + 1]
+
+
+def _open_pdf(backend, file_content):
+    if backend == "pymupdf":
+        return pymupdf.open(stream=file_content, filetype="pdf")
+    return pypdf.PdfReader(file_content)
 
-    return "\n".join(text_output)
 
+def _pdf_page_text(backend, doc, page_num):
+    if backend == "pymupdf":
+        return doc.load_page(page_num).get_text("text")
+    return doc.pages[page_num].extract_text()
 
-def extract_text_from_docx(file_content):
-    text = []
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as temp:
-        temp.write(file_content)
-        temp_path = temp.name
 
+def extract_text_from_pdf(file_obj, max_chars=None):
+    buf = io.StringIO()
+    w = buf.write
     try:
-        doc = DocxDocument(temp_path)
+        # MuPDF is much faster than pypdf; pypdf stays as the fallback when
+        # pymupdf isn't installed, is disabled via PDF_BACKEND, or rejects the file.
+        backend = "pypdf"
+        doc = None
+        if SERVER_CONFIG["pdf_backend"] == "pymupdf" and pymupdf is not None:
+            try:
+                doc = _open_pdf("pymupdf", file_obj.read())
+                backend = "pymupdf"
+            except pymupdf.FileDataError:
+                file_obj.seek(0)
+        if doc is None:
+            doc = _open_pdf(backend, file_obj)
+
+        page_count = doc.page_count if backend == "pymupdf" else len(doc.pages)
+        w(f"PDF Document with {page_count} pages\n\n")
+
+        # Lazily, so a preview stops extracting pages once it has enough text.
+        page_texts = (
+            _pdf_page_text(backend, doc, page_num) for page_num in range(page_count)
+        )
+
+        for page_num, page_text in enumerate(page_texts):
+            if page_text.strip():
+                w(f"\n--- Page {page_num + 1} ---\n\n")
+                w(page_text)
+                w("\n")
+            else:
+                w(f"\n--- Page {page_num + 1} (No extractable text) ---\n\n")
+            if max_chars is not None and buf.tell() > max_chars:
+                break
+    except Exception as e:
+        w(f"Error extracting PDF text: {str(e)}")
+
+    return buf.getvalue()
+
+
+def _format_cell(value):
+    return "" if value is None else str(value)
+
+
+def _write_numeric_stats(buf, headers, stats):
+    buf.write("\nNUMERIC COLUMN STATISTICS:\n")
+    buf.write("column\tcount\tmean\tstd\tmin\tmax\n")
+    for col in sorted(stats):
+        count, mean, m2, minimum, maximum = stats[col]
+        std = math.sqrt(m2 / (count - 1)) if count > 1 else float("nan")
+        name = headers[col] if col < len(headers) else f"column_{col + 1}"
+        buf.write(f"{name}\t{count}\t{mean:g}\t{std:g}\t{minimum:g}\t{maximum:g}\n")
+
+
+def _write_sheet(buf, title, rows, max_chars=None):
+    # Returns False if it stopped early because the output passed max_chars.
+    buf.write(f"\n\n=== SHEET: {title} ===\n\n")
+    header = next(rows, None)
+    if header is None:
+        buf.write("(Empty sheet)\n")
+        return True
+
+    headers = [_format_cell(v) for v in header]
+    buf.write("COLUMNS: " + ", ".join(headers) + "\n\n")
+
+    # Per-column running (count, mean, M2, min, max), Welford's method.
+    stats = defaultdict(lambda: [0, 0.0, 0.0, math.inf, -math.inf])
+    # Tab-separated; cells containing tabs, newlines or quotes are quoted so
+    # they can't break the row layout.
+    writerow = csv.writer(buf, delimiter="\t", lineterminator="\n").writerow
+    for row in rows:
+        writerow(row)
+        if max_chars is not None and buf.tell() > max_chars:
+            return False
+        for col, value in enumerate(row):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                acc = stats[col]
+                acc[0] += 1
+                delta = value - acc[1]
+                acc[1] += delta / acc[0]
+                acc[2] += delta * (value - acc[1])
+                acc[3] = min(acc[3], value)
+                acc[4] = max(acc[4], value)
+
+    if stats:
+        _write_numeric_stats(buf, headers, stats)
+    return True
+
+
+def _write_legacy_workbook(buf, file_obj, max_chars=None):
+    # openpyxl only reads .xlsx; legacy .xls workbooks go through pandas (xlrd).
+    file_obj.seek(0)
+    sheets = pd.read_excel(file_obj, sheet_name=None, header=None, dtype=object)
+    for title, df in sheets.items():
+        df = df.astype(object).where(df.notna(), None)
+        rows = df.itertuples(index=False, name=None)
+        if not _write_sheet(buf, title, rows, max_chars):
+            break
+
+
+def extract_text_from_excel(file_obj, max_chars=None):
+    buf = io.StringIO()
+
+    try:
+        try:
+            wb = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+        except zipfile.BadZipFile:
+            if pd is None:
+                raise
+            _write_legacy_workbook(buf, file_obj, max_chars)
+            return buf.getvalue()
+        try:
+            for ws in wb.worksheets:
+                rows = ws.iter_rows(values_only=True)
+                if not _write_sheet(buf, ws.title, rows, max_chars):
+                    break
+        finally:
+            wb.close()
+    except Exception as e:
+        buf.write(f"Error processing Excel file: {str(e)}")
+
+    return buf.getvalue()
+
+
+def extract_text_from_docx(file_obj, max_chars=None):
+    buf = io.StringIO()
+    w = buf.write
+    try:
+        doc = DocxDocument(file_obj)
         for para in doc.paragraphs:
-            text.append(para.text)
+            w(para.text)
+            w("\n")
+            if max_chars is not None and buf.tell() > max_chars:
+                return buf.getvalue()
 
         for table in doc.tables:
-            text.append("\nTABLE CONTENT:")
+            w("\nTABLE CONTENT:\n")
             for row in table.rows:
-                row_text = [cell.text for cell in row.cells]
-                text.append(" | ".join(row_text))
+                w(" | ".join(cell.text for cell in row.cells))
+                w("\n")
+                if max_chars is not None and buf.tell() > max_chars:
+                    return buf.getvalue()
     except Exception as e:
-        text.append(f"Error extracting DOCX text: {str(e)}")
-    finally:
-        try:
-            os.unlink(temp_path)
-        except:
-            pass
+        w(f"Error extracting DOCX text: {str(e)}")
 
-    return "\n".join(text)
+    return buf.getvalue()
 
 
-def extract_text_from_presentation(file_content):
-    text_output = []
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pptx") as temp:
-        temp.write(file_content)
-        temp_path = temp.name
+def extract_text_from_presentation(file_obj, max_chars=None):
+    buf = io.StringIO()
+    w = buf.write
 
     try:
-        pres = Presentation(temp_path)
+        pres = Presentation(file_obj)
 
         for i, slide in enumerate(pres.slides):
-            text_output.append(f"\n=== SLIDE {i+1} ===\n")
+            w(f"\n=== SLIDE {i+1} ===\n\n")
 
             if slide.shapes.title and slide.shapes.title.text:
-                text_output.append(f"TITLE: {slide.shapes.title.text}\n")
+                w(f"TITLE: {slide.shapes.title.text}\n\n")
 
             for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text:
-                    text_output.append(shape.text)
-
-                if hasattr(shape, "has_table") and shape.has_table:
-                    text_output.append("\nTABLE CONTENT:")
+                if shape.has_text_frame:
+                    shape_text = shape.text_frame.text
+                    if shape_text:
+                        w(shape_text)
+                        w("\n")
+
+                if shape.has_table:
+                    w("\nTABLE CONTENT:\n")
                     table = shape.table
                     for r in range(len(table.rows)):
-                        row_content = []
-                        for c in range(len(table.columns)):
-                            cell = table.cell(r, c)
-                            row_content.append(cell.text)
-                        text_output.append(" | ".join(row_content))
+                        w(
+                            " | ".join(
+                                table.cell(r, c).text for c in range(len(table.columns))
+                            )
+                        )
+                        w("\n")
+
+            if max_chars is not None and buf.tell() > max_chars:
+                break
     except Exception as e:
-        text_output.append(f"Error processing presentation: {str(e)}")
-    finally:
+        w(f"Error processing presentation: {str(e)}")
+
+    return buf.getvalue()
+
+
+_MIME_DISPATCH = {
+    "application/pdf": extract_text_from_pdf,
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": extract_text_from_excel,
+    "application/vnd.ms-excel": extract_text_from_excel,
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": extract_text_from_presentation,
+    "application/vnd.ms-powerpoint": extract_text_from_presentation,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": extract_text_from_docx,
+    "application/msword": extract_text_from_docx,
+    "text/plain": extract_text_from_plain,
+}
+
+_EXT_DISPATCH = {
+    ".pdf": extract_text_from_pdf,
+    ".xlsx": extract_text_from_excel,
+    ".xls": extract_text_from_excel,
+    ".pptx": extract_text_from_presentation,
+    ".ppt": extract_text_from_presentation,
+    ".docx": extract_text_from_docx,
+    ".doc": extract_text_from_docx,
+    ".txt": extract_text_from_plain,
+}
 
-        try:
-            os.unlink(temp_path)
-        except:
-            pass
 
-    return "\n".join(text_output)
+# Google-native formats, mapped to the Office format they are exported as and
+# the extractor for that export.
+_GOOGLE_EXPORTS = {
+    "application/vnd.google-apps.document": (
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        extract_text_from_docx,
+    ),
+    "application/vnd.google-apps.spreadsheet": (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        extract_text_from_excel,
+    ),
+    "application/vnd.google-apps.presentation": (
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        extract_text_from_presentation,
+    ),
+}
+
+
+def _utf8_boundary(buf, index):
+    # Step back over continuation bytes so a chunk never splits a character.
+    while 0 < index < len(buf) and (buf[index] & 0xC0) == 0x80:
+        index -= 1
+    return index
 
 
 def create_document_chunks(content, chunk_size=4000, overlap=200):
-    if len(content) <= chunk_size:
+    # Sizes are measured in UTF-8 bytes; chunks are sliced from a single
+    # encoded buffer and only decoded back to str when emitted.
+    buf = content.encode("utf-8")
+    if len(buf) <= chunk_size:
         return [content]
+
+    view = memoryview(buf)
     chunks = []
     start = 0
 
-    while start < len(content):
-        end = min(start + chunk_size, len(content))
+    while start < len(buf):
+        end = min(start + chunk_size, len(buf))
 
-        if end < len(content):
-            natural_break = content.rfind("\n", end - 500, end)
+        if end < len(buf):
+            natural_break = buf.rfind(b"\n", max(start, end - 500), end)
             if natural_break != -1:
                 end = natural_break + 1
+            end = _utf8_boundary(buf, end)
 
-        chunks.append(content[start:end])
-        start = end - overlap
+        chunks.append(str(view[start:end], "utf-8"))
+        if end >= len(buf):
+            break
+
+        next_start = _utf8_boundary(buf, end - overlap)
+        start = next_start if next_start > start else end
 
     return chunks
 
@@ -259,8 +941,10 @@ async def summarize_chunk(ctx, chunk, focus_area=None, chunk_label=""):
         return f"{chunk_label}: Error summarizing content - {str(e)}"
 
 
-@mcp.tool()
-async def list_drive_folders(parent_folder_id: str = None):
+@json_tool
+async def list_drive_folders(
+    parent_folder_id: str = None, projection: list[str] = None
+):
     """
     Lists all folders within a specified Google Drive folder.
 
@@ -271,13 +955,16 @@ async def list_drive_folders(parent_folder_id: str = None):
         parent_folder_id (str, optional): The ID of the parent folder to list folders from.
                                          Must be a valid Google Drive folder ID.
                                          If not provided, the base folder configured in SERVER_CONFIG will be used.
+        projection (list[str], optional): Drive file fields to include for each folder.
+                                          Default is ["id", "name", "mimeType", "modifiedTime"].
+                                          Request only the fields you need, e.g. ["id", "name"].
 
     Returns:
-        list: A list of folder objects, each containing:
+        list: A list of all matching folder objects (every page of results), each
+              containing the projected fields. By default:
               - id: The unique Google Drive ID of the folder
               - name: The display name of the folder
               - mimeType: Always 'application/vnd.google-apps.folder'
-              - createdTime: Timestamp when the folder was created
               - modifiedTime: Timestamp when the folder was last modified
         dict: Error response if the operation fails, with structure:
               {"error": True, "message": "Error message"}
@@ -287,27 +974,26 @@ async def list_drive_folders(parent_folder_id: str = None):
         actual_parent = (
             parent_folder_id if parent_folder_id else SERVER_CONFIG["base_folder_id"]
         )
-        query = f"'{actual_parent}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
-
-        response = (
-            drive_service.files()
-            .list(
-                q=query,
-                spaces="drive",
-                fields="files(id, name, mimeType, createdTime, modifiedTime)",
-            )
-            .execute()
-        )
+        cache_key = ("list_drive_folders", actual_parent, tuple(projection or ()))
+        if cache_key in _LIST_CACHE:
+            return _LIST_CACHE[cache_key]
 
-        folders = response.get("files", [])
+        query = f"'{_esc(actual_parent)}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
+
+        folders = await _list_all(
+            drive_service, q=query, spaces="drive", fields=_list_fields(projection)
+        )
+        _LIST_CACHE[cache_key] = folders
         return folders
     except Exception as e:
         logger.error(f"Error listing folders: {str(e)}")
         return {"error": True, "message": f"Error listing folders: {str(e)}"}
 
 
-@mcp.tool()
-async def list_drive_files(folder_id: str = None, file_types: str = "all"):
+@json_tool
+async def list_drive_files(
+    folder_id: str = None, file_types: str = "all", projection: list[str] = None
+):
     """
     Lists all files within a specified Google Drive folder with optional filtering by file type.
 
@@ -323,85 +1009,158 @@ async def list_drive_files(folder_id: str = None, file_types: str = "all"):
                                    Supported values: "pdf", "excel"/"xlsx"/"xls", "word"/"doc"/"docx",
                                    "ppt"/"pptx"/"presentation", "txt"/"text"
                                    Example: "pdf,excel,word" will return only PDF and Office documents
+        projection (list[str], optional): Drive file fields to include for each file.
+                                          Default is ["id", "name", "mimeType", "modifiedTime"].
+                                          Add e.g. "size" or "createdTime" when needed.
 
     Returns:
-        list: A list of file objects, each containing:
+        list: A list of all matching file objects (every page of results), each
+              containing the projected fields. By default:
               - id: The unique Google Drive ID of the file
               - name: The display name of the file
               - mimeType: The MIME type of the file
-              - createdTime: Timestamp when the file was created
               - modifiedTime: Timestamp when the file was last modified
-              - size: The size of the file in bytes (if available)
         dict: Error response if the operation fails, with structure:
               {"error": True, "message": "Error message"}
     """
     try:
         drive_service = get_drive_service()
         actual_folder = folder_id if folder_id else SERVER_CONFIG["base_folder_id"]
-        query = f"'{actual_folder}' in parents and mimeType!='application/vnd.google-apps.folder' and trashed=false"
-
-        if file_types.lower() != "all":
-            type_queries = []
-            types = [t.strip().lower() for t in file_types.split(",")]
-
-            for file_type in types:
-                if file_type == "pdf":
-                    type_queries.append("mimeType='application/pdf'")
-                elif file_type in ["excel", "xlsx", "xls"]:
-                    type_queries.append(
-                        "mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'"
-                    )
-                    type_queries.append("mimeType='application/vnd.ms-excel'")
-                    type_queries.append(
-                        "mimeType='application/vnd.google-apps.spreadsheet'"
-                    )
-                elif file_type in ["word", "doc", "docx"]:
-                    type_queries.append(
-                        "mimeType='application/vnd.openxmlformats-officedocument.wordprocessingml.document'"
-                    )
-                    type_queries.append("mimeType='application/msword'")
-                    type_queries.append(
-                        "mimeType='application/vnd.google-apps.document'"
-                    )
-                elif file_type in ["ppt", "pptx", "presentation"]:
-                    type_queries.append(
-                        "mimeType='application/vnd.openxmlformats-officedocument.presentationml.presentation'"
-                    )
-                    type_queries.append("mimeType='application/vnd.ms-powerpoint'")
-                    type_queries.append(
-                        "mimeType='application/vnd.google-apps.presentation'"
-                    )
-                elif file_type in ["txt", "text"]:
-                    type_queries.append("mimeType='text/plain'")
-
-            if type_queries:
-                query += " and (" + " or ".join(type_queries) + ")"
-
-        response = (
-            drive_service.files()
-            .list(
-                q=query,
-                spaces="drive",
-                fields="files(id, name, mimeType, createdTime, modifiedTime, size)",
-            )
-            .execute()
+        cache_key = (
+            "list_drive_files",
+            actual_folder,
+            file_types,
+            tuple(projection or ()),
         )
+        if cache_key in _LIST_CACHE:
+            return _LIST_CACHE[cache_key]
+
+        query = f"'{_esc(actual_folder)}' in parents and mimeType!='application/vnd.google-apps.folder' and trashed=false"
 
-        files = response.get("files", [])
+        query += _build_type_filter(file_types)
+
+        files = await _list_all(
+            drive_service, q=query, spaces="drive", fields=_list_fields(projection)
+        )
+        _LIST_CACHE[cache_key] = files
         return files
     except Exception as e:
         logger.error(f"Error listing files: {str(e)}")
         return {"error": True, "message": f"Error listing files: {str(e)}"}
 
 
-@mcp.tool()
+async def _get_file_content(file_id, max_chars, file_metadata=None):
+    try:
+        drive_service = get_drive_service()
+        if file_metadata is None:
+            # The modifiedTime check below is what makes cached text reusable, so a
+            # metadata lookup still cached from a recent call lets a repeat request
+            # be answered without touching Drive at all.
+            file_metadata = _METADATA_CACHE.get(file_id)
+        if file_metadata is None:
+            file_metadata = await _execute(
+                drive_service.files().get(fileId=file_id, fields=METADATA_FIELDS)
+            )
+            _METADATA_CACHE[file_id] = file_metadata
+
+        cached = document_index.get(file_id)
+        if cached and cached["metadata"].get("modifiedTime") == file_metadata.get(
+            "modifiedTime"
+        ):
+            cached_text = await _get_cached_text(cached["hash"], max_chars)
+            if cached_text is not None:
+                content, total_length = cached_text
+                return {
+                    "name": file_metadata["name"],
+                    "mime_type": file_metadata["mimeType"],
+                    "content": content,
+                    "truncated": total_length > max_chars,
+                    "total_length": total_length,
+                    "from_cache": True,
+                }
+
+        mime_type = file_metadata["mimeType"]
+        export_mime = None
+        extractor_args = ()
+        if mime_type.startswith("application/vnd.google-apps."):
+            if mime_type not in _GOOGLE_EXPORTS:
+                return {
+                    "error": True,
+                    "message": f"Unsupported Google Docs file type: {mime_type}",
+                }
+            export_mime, extractor = _GOOGLE_EXPORTS[mime_type]
+        else:
+            extractor = extract_text_from_file
+            extractor_args = (mime_type, file_metadata["name"])
+
+        # A prefix extracted this way can't be cached, so only stop at max_chars where
+        # full extraction is expensive: files too big for the in-memory spool, when a
+        # short preview is asked for or when they are plain text that would be
+        # decoded in full just to be cut down. Anything else is extracted in full
+        # and cached, so repeated previews are served from the cache.
+        size = int(file_metadata.get("size", 0))
+        stop_early = size > SPOOL_MAX_SIZE and (
+            max_chars <= SERVER_CONFIG["preview_max_chars"]
+            or (
+                extractor is extract_text_from_file
+                and _file_handler(*extractor_args) is extract_text_from_plain
+                and size > max_chars * 4
+            )
+        )
+
+        file_content = await _run_io(
+            _download_file,
+            drive_service,
+            file_id,
+            export_mime,
+            size,
+        )
+        with file_content:
+            content_hash, extracted_text = await _extract_with_cache(
+                file_content,
+                extractor,
+                *extractor_args,
+                max_chars=max_chars if stop_early else None,
+            )
+
+        if content_hash is None:
+            # Only a prefix was extracted, so the full length is unknown.
+            return {
+                "name": file_metadata["name"],
+                "mime_type": file_metadata["mimeType"],
+                "content": extracted_text[:max_chars],
+                "truncated": True,
+                "total_length": None,
+                "from_cache": False,
+            }
+
+        document_index[file_id] = {"hash": content_hash, "metadata": file_metadata}
+        await _save_document_index()
+
+        return {
+            "name": file_metadata["name"],
+            "mime_type": file_metadata["mimeType"],
+            "content": extracted_text[:max_chars],
+            "truncated": len(extracted_text) > max_chars,
+            "total_length": len(extracted_text),
+            "from_cache": False,
+        }
+    except Exception as e:
+        logger.error(f"Error getting file content: {str(e)}")
+        return {"error": True, "message": f"Error getting file content: {str(e)}"}
+
+
+@json_tool
 async def get_file_content(file_id: str, max_chars: int = 100000):
     """
     Retrieves and extracts the text content from a file in Google Drive.
 
     This tool downloads the specified file from Google Drive and extracts its textual content.
     It supports various file types including PDF, Excel, Word, PowerPoint, and plain text.
-    The extracted content is cached to improve performance for subsequent requests.
+    Extracted content is cached on disk by content hash, so unchanged files are not
+    re-extracted on subsequent requests, even across server restarts. File metadata is
+    shared with get_file_metadata's cache, so a file changed on Drive within the last
+    few minutes (METADATA_CACHE_TTL) may still be served from the cached version.
 
     Parameters:
         file_id (str): The ID of the file to retrieve.
@@ -416,112 +1175,90 @@ async def get_file_content(file_id: str, max_chars: int = 100000):
               - mime_type: The MIME type of the file
               - content: The extracted text content (up to max_chars)
               - truncated: Boolean indicating if the content was truncated
-              - total_length: Total length of the extracted content in characters
+              - total_length: Total length of the extracted content in characters, or
+                None when extraction stopped early at max_chars (small max_chars
+                previews of files over 16 MB, and plain-text files over 16 MB)
               - from_cache: Boolean indicating if the content was retrieved from cache
         dict: Error response if the operation fails, with structure:
               {"error": True, "message": "Error message"}
     """
-    try:
-        if file_id in document_cache:
-            content, metadata = document_cache[file_id]
-            return {
-                "name": metadata.get("name", "Unknown"),
-                "mime_type": metadata.get("mimeType", "Unknown"),
-                "content": content[:max_chars],
-                "truncated": len(content) > max_chars,
-                "total_length": len(content),
-                "from_cache": True,
-            }
+    return await _singleflight(
+        ("get_file_content", file_id, max_chars),
+        lambda: _get_file_content(file_id, max_chars),
+    )
 
-        drive_service = get_drive_service()
-        file_metadata = (
-            drive_service.files().get(fileId=file_id, fields="name,mimeType").execute()
-        )
 
-        if file_metadata["mimeType"].startswith("application/vnd.google-apps."):
-            if file_metadata["mimeType"] == "application/vnd.google-apps.document":
-                request = drive_service.files().export_media(
-                    fileId=file_id,
-                    mimeType="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                )
-                file_content = io.BytesIO()
-                downloader = MediaIoBaseDownload(file_content, request)
-
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
-
-                content_bytes = file_content.getvalue()
-                extracted_text = extract_text_from_docx(content_bytes)
-            elif file_metadata["mimeType"] == "application/vnd.google-apps.spreadsheet":
-                request = drive_service.files().export_media(
-                    fileId=file_id,
-                    mimeType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                )
-                file_content = io.BytesIO()
-                downloader = MediaIoBaseDownload(file_content, request)
-
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
-
-                content_bytes = file_content.getvalue()
-                extracted_text = extract_text_from_excel(content_bytes)
-            elif (
-                file_metadata["mimeType"] == "application/vnd.google-apps.presentation"
-            ):
-                request = drive_service.files().export_media(
-                    fileId=file_id,
-                    mimeType="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+@json_tool
+async def get_files_content_bulk(
+    file_ids: list[str], max_chars: int = 100000, concurrency: int = 4
+):
+    """
+    Retrieves and extracts the text content of several Google Drive files concurrently.
+
+    Metadata for all files is looked up in batched requests first, then the files are
+    downloaded in parallel, with at most `concurrency` downloads in flight at once to
+    stay within Drive's rate limits. A failure on one file does not affect the others;
+    it is reported in that file's entry.
+
+    Parameters:
+        file_ids (list[str]): The IDs of the files to retrieve.
+                             Must be valid Google Drive file IDs.
+        max_chars (int, optional): Maximum number of characters to return per file.
+                                  Default is 100000.
+        concurrency (int, optional): Maximum number of files downloaded at the same time.
+                                    Default is 4.
+
+    Returns:
+        list: One entry per requested file, in the same order as file_ids. Each entry
+              contains file_id plus either the fields returned by get_file_content or
+              an error response: {"error": True, "message": "Error message"}
+        dict: Error response if the operation fails, with structure:
+              {"error": True, "message": "Error message"}
+    """
+    try:
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        # Batched metadata for every file up front, instead of a files.get per file.
+        # Files whose lookup failed in the batch retry it individually.
+        metadata = await _get_metadata_many(file_ids)
+
+        async def fetch_one(file_id):
+            file_metadata = metadata.get(file_id)
+            if file_metadata is not None and file_metadata.get("error"):
+                file_metadata = None
+            async with semaphore:
+                return await _singleflight(
+                    ("get_file_content", file_id, max_chars),
+                    lambda: _get_file_content(file_id, max_chars, file_metadata),
                 )
-                file_content = io.BytesIO()
-                downloader = MediaIoBaseDownload(file_content, request)
 
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
+        results = await asyncio.gather(
+            *[fetch_one(file_id) for file_id in file_ids], return_exceptions=True
+        )
 
-                content_bytes = file_content.getvalue()
-                extracted_text = extract_text_from_presentation(content_bytes)
-            else:
-                return {
+        contents = []
+        for file_id, result in zip(file_ids, results):
+            if isinstance(result, BaseException):
+                result = {
                     "error": True,
-                    "message": f"Unsupported Google Docs file type: {file_metadata['mimeType']}",
+                    "message": f"Error getting file content: {str(result)}",
                 }
-        else:
-            request = drive_service.files().get_media(fileId=file_id)
-            file_content = io.BytesIO()
-            downloader = MediaIoBaseDownload(file_content, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-            content_bytes = file_content.getvalue()
-            extracted_text = extract_text_from_file(
-                content_bytes, file_metadata["mimeType"], file_metadata["name"]
-            )
-
-        document_cache[file_id] = (extracted_text, file_metadata)
-
+            contents.append({"file_id": file_id, **result})
+        return contents
+    except Exception as e:
+        logger.error(f"Error getting file contents in bulk: {str(e)}")
         return {
-            "name": file_metadata["name"],
-            "mime_type": file_metadata["mimeType"],
-            "content": extracted_text[:max_chars],
-            "truncated": len(extracted_text) > max_chars,
-            "total_length": len(extracted_text),
-            "from_cache": False,
+            "error": True,
+            "message": f"Error getting file contents in bulk: {str(e)}",
         }
-    except Exception as e:
-        logger.error(f"Error getting file content: {str(e)}")
-        return {"error": True, "message": f"Error getting file content: {str(e)}"}
 
 
-@mcp.tool()
+@json_tool
 async def get_file_metadata(file_id: str):
     """
     Retrieves metadata for a specific file in Google Drive.
 
     This tool fetches detailed metadata about a file without downloading its content.
-    It first checks the document cache to avoid unnecessary API calls.
+    Results are cached for a few minutes to avoid unnecessary API calls.
 
     Parameters:
         file_id (str): The ID of the file to retrieve metadata for.
@@ -540,28 +1277,61 @@ async def get_file_metadata(file_id: str):
               {"error": True, "message": "Error message"}
     """
     try:
-        if file_id in document_cache:
-            _, metadata = document_cache[file_id]
-            return metadata
+        if file_id in _METADATA_CACHE:
+            return _METADATA_CACHE[file_id]
 
         drive_service = get_drive_service()
-        metadata = (
-            drive_service.files()
-            .get(
-                fileId=file_id,
-                fields="id,name,mimeType,size,createdTime,modifiedTime,parents",
-            )
-            .execute()
+        metadata = await _singleflight(
+            ("get_file_metadata", file_id),
+            lambda: _execute(
+                drive_service.files().get(fileId=file_id, fields=METADATA_FIELDS)
+            ),
         )
 
+        _METADATA_CACHE[file_id] = metadata
         return metadata
     except Exception as e:
         logger.error(f"Error getting file metadata: {str(e)}")
         return {"error": True, "message": f"Error getting file metadata: {str(e)}"}
 
 
-@mcp.tool()
-async def search_drive_files(query: str, folder_id: str = None):
+@json_tool
+async def get_file_metadata_bulk(file_ids: list[str]):
+    """
+    Retrieves metadata for many files in Google Drive using batched API requests.
+
+    Up to 25 metadata lookups share a single HTTP round trip, and larger lists are
+    split into batches that are sent concurrently. Use this instead of calling
+    get_file_metadata repeatedly when looking up several files at once.
+
+    Parameters:
+        file_ids (list[str]): The IDs of the files to retrieve metadata for.
+                             Must be valid Google Drive file IDs.
+
+    Returns:
+        dict: A dictionary keyed by file ID. Each value is either the file metadata
+              (same fields as get_file_metadata) or an error entry for that file:
+              {"error": True, "message": "Error message"}
+        dict: Error response if the operation fails, with structure:
+              {"error": True, "message": "Error message"}
+    """
+    try:
+        return await _get_metadata_many(file_ids)
+    except Exception as e:
+        logger.error(f"Error getting file metadata in bulk: {str(e)}")
+        return {
+            "error": True,
+            "message": f"Error getting file metadata in bulk: {str(e)}",
+        }
+
+
+@json_tool
+async def search_drive_files(
+    query: str,
+    folder_id: str = None,
+    projection: list[str] = None,
+    max_results: int = None,
+):
     """
     Searches for files in Google Drive that match a full-text search query.
 
@@ -575,48 +1345,100 @@ async def search_drive_files(query: str, folder_id: str = None):
         folder_id (str, optional): ID of a folder to restrict the search within.
                                   If provided, only searches within this folder (not recursive).
                                   If not provided, searches across all accessible files.
+        projection (list[str], optional): Drive file fields to include for each match.
+                                          Default is ["id", "name", "mimeType", "modifiedTime"].
+        max_results (int, optional): Maximum number of matches to return. Paging stops
+                                    as soon as this many have been fetched, which is
+                                    much cheaper than listing every match for broad
+                                    queries. If not provided, all matches are returned.
+                                    Must be at least 1.
 
     Returns:
-        list: A list of file objects that match the search query, each containing:
+        list: A list of the file objects that match the search query (every page of
+              results, up to max_results), each containing the projected fields. By default:
               - id: The unique Google Drive ID of the file
               - name: The display name of the file
               - mimeType: The MIME type of the file
-              - createdTime: Timestamp when the file was created
               - modifiedTime: Timestamp when the file was last modified
         dict: Error response if the operation fails, with structure:
               {"error": True, "message": "Error message"}
     """
     try:
+        if max_results is not None and max_results < 1:
+            return {
+                "error": True,
+                "message": f"max_results must be at least 1, got {max_results}",
+            }
+
+        # Drive full-text search ignores case and extra whitespace, so queries that
+        # differ only in those share a cache entry.
+        query = " ".join(query.split())
+        cache_key = (
+            "search_drive_files",
+            query.lower(),
+            folder_id,
+            tuple(projection or ()),
+            max_results,
+        )
+        if cache_key in _LIST_CACHE:
+            return _LIST_CACHE[cache_key]
+
         drive_service = get_drive_service()
 
-        search_query = f"fullText contains '{query}' and trashed=false"
+        search_query = f"fullText contains '{_esc(query)}' and trashed=false"
         if folder_id:
-            search_query += f" and '{folder_id}' in parents"
-
-        response = (
-            drive_service.files()
-            .list(
-                q=search_query,
-                spaces="drive",
-                fields="files(id,name,mimeType,createdTime,modifiedTime)",
-            )
-            .execute()
+            search_query += f" and '{_esc(folder_id)}' in parents"
+
+        files = await _list_all(
+            drive_service,
+            limit=max_results,
+            q=search_query,
+            spaces="drive",
+            fields=_list_fields(projection),
         )
-
-        files = response.get("files", [])
+        _LIST_CACHE[cache_key] = files
         return files
     except Exception as e:
         logger.error(f"Error searching files: {str(e)}")
         return {"error": True, "message": f"Error searching files: {str(e)}"}
 
 
+@json_tool
+async def cache_clear():
+    """
+    Clears the persistent document cache and the listing, search and metadata caches.
+
+    Extracted document text is cached on disk, keyed by a SHA-256 hash of the file
+    contents, so it survives server restarts; recently used documents are also kept
+    in memory. Listing, search and metadata results are cached in memory for a short
+    time. Use this tool to force subsequent calls to re-read everything from Google
+    Drive.
+
+    Returns:
+        dict: A dictionary containing:
+              - cleared: Number of cached documents that were removed
+        dict: Error response if the operation fails, with structure:
+              {"error": True, "message": "Error message"}
+    """
+    try:
+        removed = await _run_io(_clear_cache_dir)
+        document_index.clear()
+        _DOC_MEMORY_CACHE.clear()
+        _LIST_CACHE.clear()
+        _METADATA_CACHE.clear()
+        return {"cleared": removed}
+    except Exception as e:
+        logger.error(f"Error clearing document cache: {str(e)}")
+        return {"error": True, "message": f"Error clearing document cache: {str(e)}"}
+
+
 async def verify_base_folder():
     try:
         drive_service = get_drive_service()
-        folder = (
-            drive_service.files()
-            .get(fileId=SERVER_CONFIG["base_folder_id"], fields="id,name,mimeType")
-            .execute()
+        folder = await _execute(
+            drive_service.files().get(
+                fileId=SERVER_CONFIG["base_folder_id"], fields="id,name,mimeType"
+            )
         )
 
         if folder["mimeType"] != "application/vnd.google-apps.folder":
@@ -665,13 +1487,25 @@ async def initialize_server():
 
 async def shutdown_server():
     logger.info("Shutting down Google Drive Competitor Analysis MCP server...")
-    document_cache.clear()
+    try:
+        await _save_document_index()
+    except Exception as e:
+        logger.error(f"Error saving document cache index: {str(e)}")
+    _IO_EXEC.shutdown(wait=True)
+    _CPU_EXEC.shutdown(wait=True)
     logger.info("Server shutdown complete")
 
 
 if __name__ == "__main__":
     print("Starting Google Drive Competitor Analysis MCP server...")
-    loop = asyncio.get_event_loop()
+    try:
+        import uvloop
+
+        # Also picked up by the loop mcp.run() starts, via the installed policy.
+        uvloop.install()
+    except ImportError:
+        pass
+    loop = asyncio.new_event_loop()
     try:
         loop.run_until_complete(initialize_server())
         mcp.run(transport="stdio")
@@ -685,3 +1519,5 @@ if __name__ == "__main__":
             loop.run_until_complete(shutdown_server())
         except Exception as e:
             logger.error(f"Error during server shutdown: {e}")
+        finally:
+            loop.close()
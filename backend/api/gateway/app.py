@@ -1,20 +1,20 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Optional, Any, List, Literal
+from collections import OrderedDict
 import uuid
 import asyncio
 import os
-import json
 import logging
-import traceback
 from dotenv import load_dotenv
 from pathlib import Path
+import orjson
 from .client_gemini import MCPClient as GeminiClient
 import time
 import re
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 import uvicorn
 
 env_path = Path(__file__).parent / ".env"
@@ -28,16 +28,26 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    stop_reaper = asyncio.Event()
+    reaper = asyncio.create_task(reap_idle_sessions(stop_reaper))
     yield
 
+    # Stopped rather than cancelled, so a session it is closing right now is fully
+    # cleaned up instead of being interrupted after leaving active_sessions.
+    stop_reaper.set()
+    try:
+        await reaper
+    except Exception as e:
+        logger.exception(f"Idle session reaper failed: {str(e)}")
     for session_id, client in list(active_sessions.items()):
         try:
             await client.cleanup()
         except Exception as e:
-            logger.error(f"Error cleaning up session {session_id}: {str(e)}")
+            logger.exception(f"Error cleaning up session {session_id}: {str(e)}")
 
     active_sessions.clear()
     session_types.clear()
+    session_last_used.clear()
 
 
 app = FastAPI(title="Agentic AI Platform API", lifespan=lifespan)
@@ -74,8 +84,18 @@ class ApiResponse(BaseModel):
     response: Optional[str] = None
 
 
-active_sessions: Dict[str, Any] = {}
+# Ordered least to most recently used, so the oldest sessions are evicted first.
+active_sessions: "OrderedDict[str, Any]" = OrderedDict()
 session_types: Dict[str, str] = {}
+session_last_used: Dict[str, float] = {}
+# Number of queries currently running per session; such sessions are never closed
+# by eviction or the idle reaper.
+session_queries: Dict[str, int] = {}
+
+# Each session holds an MCP server subprocess, so both are capped.
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "100"))
+SESSION_IDLE_TTL = int(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_REAP_INTERVAL = 60
 
 SERVER_PATHS = {
     "rfx": "./backend/agents/rfx_analyzer/mcp-server_rfx/server_test.py",
@@ -83,6 +103,79 @@ SERVER_PATHS = {
     "raw_rfx": "./backend/agents/raw_data_processor/mcp_server_rfx_raw_data/server.py",
 }
 
+# Progress events buffered per stream before the oldest start being dropped.
+SSE_MAX_QUEUE_SIZE = int(os.getenv("SSE_MAX_QUEUE_SIZE", "256"))
+
+# How often an open stream checks whether its client has gone away.
+SSE_DISCONNECT_POLL_SECONDS = 2.0
+
+# Matches the step number in the client's "Successfully ... step N" messages.
+_STEP_RE = re.compile(r"step\s+(\d+)", re.IGNORECASE)
+
+SSE_PREFIX = b"data: "
+SSE_SUFFIX = b"\n\n"
+
+
+def _sse_event(payload):
+    # Progress details come from the MCP client; keep json.dumps' handling of
+    # non-string keys.
+    return (
+        SSE_PREFIX + orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS) + SSE_SUFFIX
+    )
+
+
+def touch_session(session_id: str):
+    active_sessions.move_to_end(session_id)
+    session_last_used[session_id] = time.monotonic()
+
+
+@contextmanager
+def session_query(session_id: str):
+    session_queries[session_id] = session_queries.get(session_id, 0) + 1
+    if session_id in active_sessions:
+        touch_session(session_id)
+    try:
+        yield
+    finally:
+        if session_queries[session_id] > 1:
+            session_queries[session_id] -= 1
+        else:
+            del session_queries[session_id]
+        # Idle time counts from the end of a query, not its start.
+        if session_id in active_sessions:
+            touch_session(session_id)
+
+
+async def close_session(session_id: str):
+    client = active_sessions.pop(session_id, None)
+    session_types.pop(session_id, None)
+    session_last_used.pop(session_id, None)
+    if client is not None:
+        try:
+            await client.cleanup()
+        except Exception as e:
+            logger.exception(f"Error cleaning up session {session_id}: {str(e)}")
+
+
+async def reap_idle_sessions(stop: asyncio.Event):
+    while True:
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=SESSION_REAP_INTERVAL)
+            return
+        except asyncio.TimeoutError:
+            pass
+        cutoff = time.monotonic() - SESSION_IDLE_TTL
+        # Sessions are in LRU order, so the idle ones are all at the front.
+        for session_id in list(active_sessions):
+            if session_last_used.get(session_id, 0) >= cutoff:
+                break
+            if session_id in session_queries:
+                continue
+            if stop.is_set():
+                return
+            logger.info(f"Closing idle session {session_id}")
+            await close_session(session_id)
+
 
 async def load_mcp_client(server_type: str):
     try:
@@ -96,13 +189,8 @@ async def load_mcp_client(server_type: str):
 
         return client
     except Exception as e:
-        import traceback
-
-        full_traceback = traceback.format_exc()
-        logger.error(f"Full traceback: {full_traceback}")
-        raise Exception(
-            f"Error initializing MCPClient: {str(e)}\nFull traceback: {full_traceback}"
-        )
+        logger.exception(f"Error initializing MCPClient: {str(e)}")
+        raise Exception(f"Error initializing MCPClient: {str(e)}") from e
 
 
 @app.post("/api/init", response_model=ApiResponse)
@@ -140,6 +228,18 @@ async def initialize_session(request: InitRequest):
 
         active_sessions[session_id] = client
         session_types[session_id] = request.server_type
+        touch_session(session_id)
+        excess = len(active_sessions) - MAX_SESSIONS
+        if excess > 0:
+            # Least recently used first, skipping sessions with a query running.
+            idle_ids = [
+                sid
+                for sid in active_sessions
+                if sid not in session_queries and sid != session_id
+            ]
+            for oldest_id in idle_ids[:excess]:
+                logger.info(f"Session limit reached, closing session {oldest_id}")
+                await close_session(oldest_id)
 
         tools = []
         try:
@@ -151,24 +251,23 @@ async def initialize_session(request: InitRequest):
         return {
             "status": "connected",
             "message": f"Session initialized successfully with {request.server_type} server",
-            "response": json.dumps(
+            "response": orjson.dumps(
                 {
                     "session_id": session_id,
                     "server_type": request.server_type,
                     "available_tools": tools,
                 }
-            ),
+            ).decode(),
         }
 
     except Exception as e:
-        logger.error(f"Error initializing session: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception(f"Error initializing session: {str(e)}")
         return {"status": "error", "message": f"Failed to initialize session: {str(e)}"}
 
 
-@app.get("/api/server-types")
-async def get_server_types():
-    return {
+# The payload never changes, so it is serialized once at import rather than per request.
+SERVER_TYPES_JSON = orjson.dumps(
+    {
         "server_types": [
             {
                 "id": "rfx",
@@ -187,6 +286,16 @@ async def get_server_types():
             },
         ]
     }
+)
+
+
+@app.get("/api/server-types")
+async def get_server_types():
+    return Response(
+        content=SERVER_TYPES_JSON,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=3600"},
+    )
 
 
 @app.post("/api/query", response_model=ApiResponse)
@@ -201,31 +310,40 @@ async def process_query(request: QueryRequest):
             f"Processing query for session {request.session_id}: {request.query}"
         )
 
-        response = await client.process_query(request.query)
+        with session_query(request.session_id):
+            response = await client.process_query(request.query)
 
         return {"status": "success", "response": response}
 
     except HTTPException as he:
         raise he
     except Exception as e:
-        logger.error(f"Error processing query: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception(f"Error processing query: {str(e)}")
         return {"status": "error", "message": f"Failed to process query: {str(e)}"}
 
 
 @app.get("/api/query-stream")
-async def stream_query(session_id: str = Query(...), query: str = Query(...)):
+async def stream_query(
+    request: Request, session_id: str = Query(...), query: str = Query(...)
+):
+    async def wait_for_disconnect():
+        while not await request.is_disconnected():
+            await asyncio.sleep(SSE_DISCONNECT_POLL_SECONDS)
+
     async def event_generator():
         try:
             if session_id not in active_sessions:
-                yield f"data: {json.dumps({'type': 'error', 'message': 'Session not found'})}\n\n"
+                yield _sse_event({"type": "error", "message": "Session not found"})
                 return
 
             client = active_sessions[session_id]
+            touch_session(session_id)
 
-            yield f"data: {json.dumps({'type': 'progress', 'message': 'Analyzing your request...'})}\n\n"
+            yield _sse_event(
+                {"type": "progress", "message": "Analyzing your request..."}
+            )
 
-            progress_queue = asyncio.Queue()
+            progress_queue = asyncio.Queue(maxsize=SSE_MAX_QUEUE_SIZE)
 
             processing_complete = False
             final_response_sent = False
@@ -236,38 +354,43 @@ async def stream_query(session_id: str = Query(...), query: str = Query(...)):
                 try:
 
                     def progress_callback(message, details=None):
-                        modified_details = details.copy() if details else {}
+                        modified_details = details or {}
 
-                        if "Successfully" in message and "step" in message.lower():
-                            step_match = re.search(
-                                r"step\s+(\d+)", message, re.IGNORECASE
-                            )
+                        if "Successfully" in message:
+                            step_match = _STEP_RE.search(message)
                             if step_match:
                                 step_num = int(step_match.group(1))
+                                # Copy only when adding keys, so the caller's dict
+                                # is left untouched.
+                                modified_details = dict(details) if details else {}
                                 modified_details["status"] = "completed"
                                 modified_details["step"] = step_num
                                 print(f"Setting step {step_num} as completed")
 
-                        asyncio.create_task(
-                            progress_queue.put(
-                                {
-                                    "type": "progress",
-                                    "message": message,
-                                    "details": modified_details,
-                                    "metrics": (
-                                        modified_details.get("metrics")
-                                        if modified_details
-                                        else None
-                                    ),
-                                    "timestamp": time.time(),
-                                }
-                            )
+                        if progress_queue.full():
+                            # The client is reading slower than progress is
+                            # reported; drop the oldest update instead of letting
+                            # the backlog grow without bound.
+                            progress_queue.get_nowait()
+                        progress_queue.put_nowait(
+                            {
+                                "type": "progress",
+                                "message": message,
+                                "details": modified_details,
+                                "metrics": (
+                                    modified_details.get("metrics")
+                                    if modified_details
+                                    else None
+                                ),
+                                "timestamp": time.time(),
+                            }
                         )
 
                     if hasattr(client, "set_progress_callback"):
                         client.set_progress_callback(progress_callback)
 
-                    response = await client.process_query(query)
+                    with session_query(session_id):
+                        response = await client.process_query(query)
 
                     await progress_queue.put(
                         {
@@ -279,8 +402,7 @@ async def stream_query(session_id: str = Query(...), query: str = Query(...)):
                     final_response_sent = True
 
                 except Exception as e:
-                    logger.error(f"Error processing streamed query: {str(e)}")
-                    logger.error(traceback.format_exc())
+                    logger.exception(f"Error processing streamed query: {str(e)}")
                     await progress_queue.put(
                         {
                             "type": "error",
@@ -293,26 +415,44 @@ async def stream_query(session_id: str = Query(...), query: str = Query(...)):
                     processing_complete = True
 
             process_task = asyncio.create_task(process_query_task())
+            # Without this, a client that goes away mid-analysis leaves the query
+            # running until the next write to the dead connection fails.
+            disconnect_task = asyncio.create_task(wait_for_disconnect())
+            get_task = None
 
             consecutive_timeouts = 0
             max_consecutive_timeouts = 3
             timeout_seconds = 20.0
 
-            while not (
-                processing_complete and progress_queue.empty() and final_response_sent
-            ):
-                try:
-                    result = await asyncio.wait_for(
-                        progress_queue.get(), timeout=timeout_seconds
+            try:
+                while not (
+                    processing_complete
+                    and progress_queue.empty()
+                    and final_response_sent
+                ):
+                    if get_task is None:
+                        get_task = asyncio.ensure_future(progress_queue.get())
+                    done, _ = await asyncio.wait(
+                        {get_task, disconnect_task},
+                        timeout=timeout_seconds,
+                        return_when=asyncio.FIRST_COMPLETED,
                     )
-                    consecutive_timeouts = 0
 
-                    yield f"data: {json.dumps(result)}\n\n"
+                    if disconnect_task in done:
+                        logger.info(f"Client disconnected from session {session_id}")
+                        break
+
+                    if get_task in done:
+                        result = get_task.result()
+                        get_task = None
+                        consecutive_timeouts = 0
 
-                    if result.get("type") in ["final", "error"]:
-                        final_response_sent = True
+                        yield _sse_event(result)
+
+                        if result.get("type") in ["final", "error"]:
+                            final_response_sent = True
+                        continue
 
-                except asyncio.TimeoutError:
                     consecutive_timeouts += 1
 
                     keepalive_data = {
@@ -323,8 +463,7 @@ async def stream_query(session_id: str = Query(...), query: str = Query(...)):
                         "final_sent": final_response_sent,
                         "timestamp": time.time(),
                     }
-                    keepalive_json = json.dumps(keepalive_data)
-                    yield f"data: {keepalive_json}\n\n"
+                    yield _sse_event(keepalive_data)
 
                     if (
                         consecutive_timeouts >= max_consecutive_timeouts
@@ -340,21 +479,24 @@ async def stream_query(session_id: str = Query(...), query: str = Query(...)):
                                 "message": "Analysis timed out or disconnected. Please try again.",
                                 "timestamp": time.time(),
                             }
-                            error_json = json.dumps(error_data)
-                            yield f"data: {error_json}\n\n"
+                            yield _sse_event(error_data)
                         break
-
-            if not process_task.done():
-                process_task.cancel()
-                try:
-                    await process_task
-                except asyncio.CancelledError:
-                    pass
+            finally:
+                # Also reached when the server closes the generator after the
+                # client drops, so the analysis never outlives its stream.
+                disconnect_task.cancel()
+                if get_task is not None:
+                    get_task.cancel()
+                if not process_task.done():
+                    process_task.cancel()
+                    try:
+                        await process_task
+                    except asyncio.CancelledError:
+                        pass
 
         except Exception as e:
-            logger.error(f"Error in event stream: {str(e)}")
-            logger.error(traceback.format_exc())
-            yield f"data: {json.dumps({'type': 'error', 'message': f'Stream error: {str(e)}'})}\n\n"
+            logger.exception(f"Error in event stream: {str(e)}")
+            yield _sse_event({"type": "error", "message": f"Stream error: {str(e)}"})
 
     return StreamingResponse(
         event_generator(),
@@ -378,16 +520,7 @@ async def health_check():
 
 @app.delete("/api/session/{session_id}")
 async def delete_session(session_id: str):
-    if session_id in active_sessions:
-        try:
-            await active_sessions[session_id].cleanup()
-        except Exception as e:
-            logger.error(f"Error during session cleanup: {str(e)}")
-            logger.error(traceback.format_exc())
-        finally:
-            del active_sessions[session_id]
-            if session_id in session_types:
-                del session_types[session_id]
+    await close_session(session_id)
 
     return {"status": "success", "message": "Session deleted"}
 